@@ -1,4 +1,22 @@
-from deap import tools, algorithms
+import numpy as np
+from deap import tools
+
+
+def update_hall_of_fame(halloffame, icls, weight, pop_buf, fitness_buf):
+    """Updates the halloffame with the rows of the population buffer that can enter it, given
+    the weight of the fitness. Only those rows are turned into individuals of the given class,
+    with their fitness set from the fitness buffer.
+    """
+    candidates = np.arange(len(pop_buf))
+    if len(halloffame) == halloffame.maxsize:
+        candidates = np.flatnonzero(fitness_buf * weight > halloffame[-1].fitness.wvalues[0])
+
+    individuals = []
+    for i in candidates:
+        ind = icls(pop_buf[i])
+        ind.fitness.values = (fitness_buf[i],)
+        individuals.append(ind)
+    halloffame.update(individuals)
 
 
 def ea_simple_with_elitism(population, toolbox, cxpb, mutpb, ngen, stats=None,
@@ -7,55 +25,84 @@ def ea_simple_with_elitism(population, toolbox, cxpb, mutpb, ngen, stats=None,
     halloffame is used to implement an elitism mechanism. The individuals contained in the
     halloffame are directly injected into the next generation and are not subject to the
     genetic operators of selection, crossover and mutation.
+
+    The generations are kept in two pre-allocated numpy buffers of shape (population size,
+    individual size), swapped each generation, with a parallel buffer of single-objective
+    fitness values. The toolbox operators work on these buffers:
+    select(wfitnesses, k) returns the indices of the selected individuals, given their fitness
+    values multiplied by the fitness weight,
+    varyPopulation(pop_arr, cxpb, mutpb) modifies the rows in place and returns a mask of the
+    modified rows, and evaluatePopulation(pop_arr) returns the fitness value of each row.
+    stats are compiled over the fitness buffer, and the population is turned back into a list
+    of individuals once the generations are over.
     """
     logbook = tools.Logbook()
     logbook.header = ['gen', 'nevals'] + (stats.fields if stats else [])
 
+    icls = type(population[0])
+    weight = population[0].fitness.weights[0]
+    pop_buf = np.array(population, dtype=np.uint8)
+    fitness_buf = np.array([ind.fitness.values[0] if ind.fitness.valid else np.nan for ind in population])
+
     # Evaluate the individuals with an invalid fitness
-    invalid_ind = [ind for ind in population if not ind.fitness.valid]
-    fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
-    for ind, fit in zip(invalid_ind, fitnesses):
-        ind.fitness.values = fit
+    invalid_ind = np.flatnonzero(np.isnan(fitness_buf))
+    if len(invalid_ind):
+        fitness_buf[invalid_ind] = toolbox.evaluatePopulation(pop_buf[invalid_ind])
 
     if halloffame is None:
         raise ValueError("halloffame parameter must not be empty!")
 
-    halloffame.update(population)
+    update_hall_of_fame(halloffame, icls, weight, pop_buf, fitness_buf)
     hof_size = len(halloffame.items) if halloffame.items else 0
 
-    record = stats.compile(population) if stats else {}
+    record = stats.compile(fitness_buf) if stats else {}
     logbook.record(gen=0, nevals=len(invalid_ind), **record)
     if verbose:
         print(logbook.stream)
 
+    # scratch buffers the offspring are written into:
+    offspring_buf = np.empty_like(pop_buf)
+    offspring_fitness_buf = np.empty_like(fitness_buf)
+    num_offspring = len(pop_buf) - hof_size
+
     # Begin the generational process
     for gen in range(1, ngen + 1):
 
         # Select the next generation individuals
-        offspring = toolbox.select(population, len(population) - hof_size)
+        offspring = offspring_buf[:num_offspring]
+        offspring_fitness = offspring_fitness_buf[:num_offspring]
+        selected = toolbox.select(fitness_buf * weight, num_offspring)
+        np.take(pop_buf, selected, axis=0, out=offspring)
+        np.take(fitness_buf, selected, out=offspring_fitness)
 
         # Vary the pool of individuals
-        offspring = algorithms.varAnd(offspring, toolbox, cxpb, mutpb)
+        modified = toolbox.varyPopulation(offspring, cxpb, mutpb)
 
         # Evaluate the individuals with an invalid fitness
-        invalid_ind = [ind for ind in offspring if not ind.fitness.valid]
-        fitnesses = toolbox.map(toolbox.evaluate, invalid_ind)
-        for ind, fit in zip(invalid_ind, fitnesses):
-            ind.fitness.values = fit
+        invalid_ind = np.flatnonzero(modified)
+        if len(invalid_ind):
+            offspring_fitness[invalid_ind] = toolbox.evaluatePopulation(offspring[invalid_ind])
 
         # add the best back to population:
-        offspring.extend(halloffame.items)
+        for i, ind in enumerate(halloffame.items[:hof_size], start=num_offspring):
+            offspring_buf[i] = ind
+            offspring_fitness_buf[i] = ind.fitness.values[0]
 
         # Update the hall of fame with the generated individuals
-        halloffame.update(offspring)
+        update_hall_of_fame(halloffame, icls, weight, offspring, offspring_fitness)
 
         # Replace the current population by the offspring
-        population[:] = offspring
+        pop_buf, offspring_buf = offspring_buf, pop_buf
+        fitness_buf, offspring_fitness_buf = offspring_fitness_buf, fitness_buf
 
         # Append the current generation statistics to the logbook
-        record = stats.compile(population) if stats else {}
+        record = stats.compile(fitness_buf) if stats else {}
         logbook.record(gen=gen, nevals=len(invalid_ind), **record)
         if verbose:
             print(logbook.stream)
 
+    population[:] = [icls(row) for row in pop_buf]
+    for ind, fitness in zip(population, fitness_buf):
+        ind.fitness.values = (fitness,)
+
     return population, logbook
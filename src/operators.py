@@ -0,0 +1,74 @@
+import numpy as np
+
+
+def init_population(icls, size, n, rng):
+    """Creates n individuals of the given class, each holding size random binary values stored as
+    a numpy uint8 array. All the values are drawn from the numpy generator rng in a single call.
+    """
+    return [icls(row) for row in rng.integers(0, 2, (n, size), dtype=np.uint8)]
+
+
+def batch_cx_two_point(pop_arr, cxpb, rng):
+    """Executes a two-point crossover, like DEAP cxTwoPoint(), on consecutive pairs of rows of
+    the population array, each pair being mated with probability cxpb. Operates in place, drawing
+    from the numpy generator rng.
+    :return: a boolean array marking the rows actually changed by a crossover
+    """
+    num_individuals, size = pop_arr.shape
+    changed = np.zeros(num_individuals, dtype=bool)
+    pairs = np.flatnonzero(rng.random(num_individuals // 2) < cxpb)
+    if len(pairs) == 0:
+        return changed
+
+    # draw the two cx points of each pair - 1 <= cxpoint1 < cxpoint2 <= size:
+    cxpoint1 = rng.integers(1, size + 1, len(pairs))
+    cxpoint2 = rng.integers(1, size, len(pairs))
+    cxpoint2 += cxpoint2 >= cxpoint1
+    cxpoint1, cxpoint2 = np.minimum(cxpoint1, cxpoint2), np.maximum(cxpoint1, cxpoint2)
+
+    # swap the values between the cx points of each pair:
+    positions = np.arange(size)
+    swap = (positions >= cxpoint1[:, None]) & (positions < cxpoint2[:, None])
+    rows1, rows2 = 2 * pairs, 2 * pairs + 1
+    ind1, ind2 = pop_arr[rows1], pop_arr[rows2]
+    pop_arr[rows1] = np.where(swap, ind2, ind1)
+    pop_arr[rows2] = np.where(swap, ind1, ind2)
+
+    # a pair is left unchanged if the parents are equal between the cx points:
+    pair_changed = (swap & (ind1 != ind2)).any(axis=1)
+    changed[rows1] = pair_changed
+    changed[rows2] = pair_changed
+    return changed
+
+
+def batch_mut_flip_bit(pop_arr, mutpb, indpb, rng):
+    """Flips the values of the population array, like DEAP mutFlipBit(), each row being mutated
+    with probability mutpb and each of its values flipped with probability indpb. Operates in place,
+    drawing from the numpy generator rng.
+    :return: a boolean array marking the rows that had at least one value flipped
+    """
+    mutants = rng.random(len(pop_arr)) < mutpb
+    flips = rng.random(pop_arr.shape) < indpb
+    flips &= mutants[:, None]
+    pop_arr ^= flips
+
+    return flips.any(axis=1)
+
+
+def var_and(pop_arr, cxpb, mutpb, indpb, rng):
+    """Batched equivalent of DEAP varAnd() for a population array: consecutive pairs of rows are
+    mated with probability cxpb, then each row is mutated with probability mutpb. Operates in place.
+    :return: a boolean array marking the rows actually modified, the only ones whose fitness
+    is no longer valid
+    """
+    return batch_cx_two_point(pop_arr, cxpb, rng) | batch_mut_flip_bit(pop_arr, mutpb, indpb, rng)
+
+
+def sel_tournament(wfitnesses, k, tournsize, rng):
+    """Selects k individuals, like DEAP selTournament(), each being the one with the highest
+    weighted fitness out of tournsize individuals drawn at random.
+    :param wfitnesses: an array with the weighted fitness value (wvalues) of each individual
+    :return: an array with the indices of the selected individuals
+    """
+    aspirants = rng.integers(0, len(wfitnesses), (k, tournsize))
+    return aspirants[np.arange(k), wfitnesses[aspirants].argmax(axis=1)]
@@ -1,4 +1,4 @@
-import random
+from collections import OrderedDict
 
 import numpy
 import seaborn as sns
@@ -6,6 +6,7 @@ import matplotlib.pyplot as plt
 from deap import base, creator, tools
 
 import elitism
+import operators
 import teachers
 
 # problem constants:
@@ -17,10 +18,11 @@ P_CROSSOVER = 0.9  # probability for crossover
 P_MUTATION = 0.1   # probability for mutating an individual
 MAX_GENERATIONS = 200
 HALL_OF_FAME_SIZE = 30
+FITNESS_CACHE_SIZE = 100000  # max number of genotypes kept in the fitness cache
 
 # set the random seed:
 RANDOM_SEED = 42
-random.seed(RANDOM_SEED)
+rng = numpy.random.default_rng(RANDOM_SEED)
 
 toolbox = base.Toolbox()
 
@@ -30,30 +32,54 @@ nsp = teachers.TeacherSchedulingProblem(HARD_CONSTRAINT_PENALTY)
 # define a single objective, maximizing fitness strategy:
 creator.create("FitnessMin", base.Fitness, weights=(-1.0,))
 
-# create the Individual class based on list:
-creator.create("Individual", list, fitness=creator.FitnessMin)
+# create the Individual class based on a numpy array of uint8 values:
+creator.create("Individual", numpy.ndarray, fitness=creator.FitnessMin)
 
-# create an operator that randomly returns 0 or 1:
-toolbox.register("zeroOrOne", random.randint, 0, 1)
+# create the population operator to generate a list of individuals filled up with random 0s and 1s:
+toolbox.register("populationCreator", operators.init_population, creator.Individual, len(nsp), rng=rng)
 
-# create the individual operator to fill up an Individual instance:
-toolbox.register("individualCreator", tools.initRepeat, creator.Individual, toolbox.zeroOrOne,len(nsp))
 
-# create the population operator to generate a list of individuals:
-toolbox.register("populationCreator", tools.initRepeat, list, toolbox.individualCreator)
+# least-recently-used cache of the costs already calculated, keyed by the individual's bit pattern:
+fitness_cache = OrderedDict()
 
 
-# fitness calculation
-def get_cost(individual):
-    return nsp.get_cost(individual),  # return a tuple
+def get_cached_cost(key):
+    cost = fitness_cache.get(key)
+    if cost is not None:
+        fitness_cache.move_to_end(key)
+    return cost
 
 
-toolbox.register("evaluate", get_cost)
+def set_cached_cost(key, cost):
+    fitness_cache[key] = cost
+    if len(fitness_cache) > FITNESS_CACHE_SIZE:
+        fitness_cache.popitem(last=False)
+
+
+# batch fitness calculation over the rows of a population array:
+def get_population_cost(population):
+    # the cache keys are sliced out of a single copy of the whole array:
+    population = numpy.ascontiguousarray(population, dtype=numpy.uint8)
+    size = population.shape[1]
+    population_bytes = population.tobytes()
+    keys = [population_bytes[i:i + size] for i in range(0, len(population_bytes), size)]
+    costs = {key: get_cached_cost(key) for key in keys}
+
+    # calculate each genotype missing from the cache only once:
+    missing = {key: row for row, key in enumerate(keys) if costs[key] is None}
+    if missing:
+        for key, cost in zip(missing, nsp.get_population_cost(population[list(missing.values())]).tolist()):
+            costs[key] = cost
+            set_cached_cost(key, cost)
+
+    return numpy.array([costs[key] for key in keys])
+
+
+toolbox.register("evaluatePopulation", get_population_cost)
 
 # genetic operators:
-toolbox.register("select", tools.selTournament, tournsize=2)
-toolbox.register("mate", tools.cxTwoPoint)
-toolbox.register("mutate", tools.mutFlipBit, indpb=1.0/len(nsp))
+toolbox.register("select", operators.sel_tournament, tournsize=2, rng=rng)
+toolbox.register("varyPopulation", operators.var_and, indpb=1.0/len(nsp), rng=rng)
 
 
 # Genetic Algorithm flow:
@@ -63,12 +89,12 @@ def main():
     population = toolbox.populationCreator(n=POPULATION_SIZE)
 
     # prepare the statistics object:
-    stats = tools.Statistics(lambda ind: ind.fitness.values)
+    stats = tools.Statistics()  # compiled over the fitness values of the population
     stats.register("min", numpy.min)
     stats.register("avg", numpy.mean)
 
     # define the hall-of-fame object:
-    hof = tools.HallOfFame(HALL_OF_FAME_SIZE)
+    hof = tools.HallOfFame(HALL_OF_FAME_SIZE, similar=numpy.array_equal)
 
     # perform the Genetic Algorithm flow with hof feature added:
     population, logbook = elitism.ea_simple_with_elitism(population,
@@ -1,4 +1,91 @@
 import numpy as np
+from numba import njit, prange
+
+
+@njit(cache=True)
+def popcount(x):
+    """
+    Counts the bits set in a non-negative int64, with a branch-free SWAR bit count
+    :param x: the int64 to count the bits of
+    :return: the number of bits set
+    """
+    x = x - ((x >> 1) & 0x5555555555555555)
+    x = (x & 0x3333333333333333) + ((x >> 2) & 0x3333333333333333)
+    x = (x + (x >> 4)) & 0x0F0F0F0F0F0F0F0F
+    x += x >> 8
+    x += x >> 16
+    x += x >> 32
+    return x & 0x7F
+
+
+@njit(cache=True)
+def compute_cost(sched, pref_mask, shift_min, shift_max, max_shifts_per_week, shifts_per_week,
+                 hard_constraint_penalty):
+    """
+    Calculates the total cost of the various violations in the given schedule, compiled with Numba.
+    The shifts of each teacher are packed week by week into the bits of an int64, so that the
+    consecutive and weekly shifts are counted with popcount() - a week may have up to 63 shifts.
+    :param sched: a uint8 2-D array with a separate row of shifts for each teacher
+    :param pref_mask: a uint8 2-D array with 1 where a shift is against the teacher's preference
+    :param shift_min: the min number of teachers allowed for each shift of the schedule
+    :param shift_max: the max number of teachers allowed for each shift of the schedule
+    :param max_shifts_per_week: max shifts per week allowed for each teacher
+    :param shifts_per_week: the number of shifts in a week
+    :param hard_constraint_penalty: the penalty factor for a hard-constraint violation
+    :return: the calculated cost
+    """
+    num_teachers, num_shifts = sched.shape
+    hard_contstraint_violations = 0
+    soft_contstraint_violations = 0
+
+    for teacher in range(num_teachers):
+        last_shift = 0
+        for week_start in range(0, num_shifts, shifts_per_week):
+            # the shifts of the week, first shift in the lowest bit:
+            week_length = min(shifts_per_week, num_shifts - week_start)
+            bits = 0
+            for shift_index in range(week_length):
+                bits |= np.int64(sched[teacher, week_start + shift_index]) << shift_index
+
+            # consecutive shift violations, including the last shift of the previous week:
+            hard_contstraint_violations += popcount(bits & (bits >> 1)) + (last_shift & bits)
+            last_shift = bits >> (week_length - 1)
+
+            # shifts per week violations, for complete weeks:
+            if week_length == shifts_per_week:
+                hard_contstraint_violations += max(popcount(bits) - max_shifts_per_week, 0)
+
+        # shift preference violations:
+        for shift_index in range(num_shifts):
+            soft_contstraint_violations += pref_mask[teacher, shift_index] & sched[teacher, shift_index]
+
+    # teachers per shift violations:
+    for shift_index in range(num_shifts):
+        num_of_teachers = 0
+        for teacher in range(num_teachers):
+            num_of_teachers += sched[teacher, shift_index]
+        if num_of_teachers > shift_max[shift_index]:
+            hard_contstraint_violations += num_of_teachers - shift_max[shift_index]
+        elif num_of_teachers < shift_min[shift_index]:
+            hard_contstraint_violations += shift_min[shift_index] - num_of_teachers
+
+    return hard_constraint_penalty * hard_contstraint_violations + soft_contstraint_violations
+
+
+@njit(parallel=True, cache=True)
+def evaluate_population(schedules, pref_mask, shift_min, shift_max, max_shifts_per_week, shifts_per_week,
+                        hard_constraint_penalty):
+    """
+    Calculates the cost of each schedule in the population, in parallel over the schedules
+    :param schedules: a uint8 3-D array with a 2-D array of shifts per teacher for each schedule
+    :return: an int64 array with the calculated cost of each schedule
+    (other parameters as for compute_cost())
+    """
+    costs = np.empty(schedules.shape[0], dtype=np.int64)
+    for i in prange(schedules.shape[0]):
+        costs[i] = compute_cost(schedules[i], pref_mask, shift_min, shift_max, max_shifts_per_week,
+                                shifts_per_week, hard_constraint_penalty)
+    return costs
 
 
 class TeacherSchedulingProblem:
@@ -11,8 +98,8 @@ class TeacherSchedulingProblem:
         """
         self.hard_constraint_penalty = hard_constraint_penalty
 
-        # list of teachers:
-        self.teachers = ['A', 'B', 'C', 'D', 'E', 'F', 'G', 'H']
+        # teachers' labels, for display only - teachers are otherwise referred to by their index:
+        self.teacher_labels = 'ABCDEFGH'
 
         # teachers' respective shift preferences - morning, evening, night:
         self.shift_preference = [[1, 0, 0], [1, 1, 0], [0, 0, 1], [0, 1, 0], [0, 0, 1], [1, 1, 1], [0, 1, 1], [1, 1, 1]]
@@ -28,14 +115,30 @@ class TeacherSchedulingProblem:
         self.weeks = 1
 
         # useful values:
+        self.n_teachers = len(self.teacher_labels)
         self.shift_per_day = len(self.shift_min)
         self.shifts_per_week = 7 * self.shift_per_day
 
+        # shifts each teacher would rather not take, duplicated over the days of the first week -
+        # the preferences are only checked against the first week of the schedule:
+        days = self.weeks * self.shifts_per_week // self.shift_per_day
+        self.pref_mask = np.zeros((self.n_teachers, self.weeks * self.shifts_per_week), dtype=np.uint8)
+        self.pref_mask[:, :self.shifts_per_week] = 1 - np.tile(np.array(self.shift_preference, dtype=np.uint8),
+                                                               (1, self.shifts_per_week // self.shift_per_day))
+
+        # min and max number of teachers, duplicated over the days of the period:
+        self.tiled_min = np.tile(np.array(self.shift_min, dtype=np.int64), days)
+        self.tiled_max = np.tile(np.array(self.shift_max, dtype=np.int64), days)
+
+        # compile the cost kernels, or load them from the disk cache, now rather than on the first evaluation:
+        self.get_population_cost(np.zeros((1, self.__len__()), dtype=np.uint8))
+        self.get_cost(np.zeros(self.__len__(), dtype=np.uint8))
+
     def __len__(self):
         """
         :return: the number of shifts in the schedule
         """
-        return len(self.teachers) * self.shifts_per_week * self.weeks
+        return self.n_teachers * self.shifts_per_week * self.weeks
 
 
     def get_cost(self, schedule):
@@ -49,135 +152,106 @@ class TeacherSchedulingProblem:
         if len(schedule) != self.__len__():
             raise ValueError("size of schedule list should be equal to ", self.__len__())
 
-        # convert entire schedule into a dictionary with a separate schedule for each teacher:
-        teacher_shifts_dict = self.get_teacher_shifts(schedule)
+        # convert entire schedule into an array with a separate row of shifts for each teacher:
+        sched = np.ascontiguousarray(schedule, dtype=np.uint8).reshape(self.n_teachers, -1)
 
-        # count the various violations:
-        consecutive_shift_violations = self.count_consecutive_shift_violations(teacher_shifts_dict)
-        shifts_per_week_violations = self.count_shifts_per_week_violations(teacher_shifts_dict)[1]
-        teachers_per_shift_violations = self.count_teachers_per_shift_violations(teacher_shifts_dict)[1]
-        shift_preference_violations = self.count_shift_preference_violations(teacher_shifts_dict)
+        return int(compute_cost(sched, self.pref_mask, self.tiled_min, self.tiled_max,
+                                self.max_shifts_per_week, self.shifts_per_week, self.hard_constraint_penalty))
 
-        # calculate the cost of the violations:
-        hard_contstraint_violations = consecutive_shift_violations + teachers_per_shift_violations + shifts_per_week_violations
-        soft_contstraint_violations = shift_preference_violations
-
-        return self.hard_constraint_penalty * hard_contstraint_violations + soft_contstraint_violations
-
-    def get_teacher_shifts(self, schedule):
+    def get_population_cost(self, population):
         """
-        Converts the entire schedule into a dictionary with a separate schedule for each teacher
-        :param schedule: a list of binary values describing the given schedule
-        :return: a dictionary with each teacher as a key and the corresponding shifts as the value
+        Calculates the total cost of the various violations for a whole population at once
+        :param population: a sequence of schedules, each a list of binary values
+        :return: a numpy array with the calculated cost of each schedule
         """
-        shifts_per_teacher = self.__len__() // len(self.teachers)
-        teacher_shifts_dict = {}
-        shift_index = 0
+        # one row of shifts per teacher, for each schedule in the population:
+        schedules = np.ascontiguousarray(population, dtype=np.uint8).reshape(len(population), self.n_teachers, -1)
 
-        for teacher in self.teachers:
-            teacher_shifts_dict[teacher] = schedule[shift_index:shift_index + shifts_per_teacher]
-            shift_index += shifts_per_teacher
+        return evaluate_population(schedules, self.pref_mask, self.tiled_min, self.tiled_max,
+                                   self.max_shifts_per_week, self.shifts_per_week, self.hard_constraint_penalty)
 
-        return teacher_shifts_dict
-
-    def count_consecutive_shift_violations(self, teacher_shifts_dict):
+    def count_consecutive_shift_violations(self, sched):
         """
         Counts the consecutive shift violations in the schedule
-        :param teacher_shifts_dict: a dictionary with a separate schedule for each teacher
+        :param sched: a 2-D array with a separate row of shifts for each teacher
         :return: count of violations found
         """
-        violations = 0
-        # iterate over the shifts of each teacher:
-        for teacher_shifts in teacher_shifts_dict.values():
-            # look for two cosecutive '1's:
-            for shift1, shift2 in zip(teacher_shifts, teacher_shifts[1:]):
-                if shift1 == 1 and shift2 == 1:
-                    violations += 1
-        return violations
+        # look for two cosecutive '1's in the shifts of each teacher:
+        return int((sched[:, :-1] & sched[:, 1:]).sum())
+
+    def get_weekly_shifts(self, sched):
+        """
+        Counts the shifts of each teacher over each week of the schedule
+        :param sched: a 2-D array with a separate row of shifts for each teacher
+        :return: a 2-D array with a separate row of weekly shifts for each teacher
+        """
+        return sched.reshape(len(sched), self.weeks, self.shifts_per_week).sum(axis=2, dtype=np.int64)
 
-    def count_shifts_per_week_violations(self, teacher_shifts_dict):
+    def count_shifts_per_week_violations(self, sched):
         """
         Counts the max-shifts-per-week violations in the schedule
-        :param teacher_shifts_dict: a dictionary with a separate schedule for each teacher
+        :param sched: a 2-D array with a separate row of shifts for each teacher
         :return: count of violations found
         """
-        violations = 0
-        weekly_shifts_list = []
-        # iterate over the shifts of each teacher:
-        for teacher_shifts in teacher_shifts_dict.values():  # all shifts of a single teacher
-            # iterate over the shifts of each weeks:
-            for i in range(0, self.weeks * self.shifts_per_week, self.shifts_per_week):
-                # count all the '1's over the week:
-                weekly_shifts = sum(teacher_shifts[i:i + self.shifts_per_week])
-                weekly_shifts_list.append(weekly_shifts)
-                if weekly_shifts > self.max_shifts_per_week:
-                    violations += weekly_shifts - self.max_shifts_per_week
+        return int(np.maximum(self.get_weekly_shifts(sched) - self.max_shifts_per_week, 0).sum())
 
-        return weekly_shifts_list, violations
+    def count_shifts_per_week_violations_verbose(self, sched):
+        """
+        Counts the max-shifts-per-week violations in the schedule, along with the weekly shifts for display
+        :param sched: a 2-D array with a separate row of shifts for each teacher
+        :return: the list of the number of shifts of each teacher per week, and count of violations found
+        """
+        return self.get_weekly_shifts(sched).ravel().tolist(), self.count_shifts_per_week_violations(sched)
 
-    def count_teachers_per_shift_violations(self, teacher_shifts_dict):
+    def count_teachers_per_shift_violations(self, sched):
         """
         Counts the number-of-teachers-per-shift violations in the schedule
-        :param teacher_shifts_dict: a dictionary with a separate schedule for each teacher
+        :param sched: a 2-D array with a separate row of shifts for each teacher
         :return: count of violations found
         """
         # sum the shifts over all teachers:
-        total_per_shift_list = [sum(shift) for shift in zip(*teacher_shifts_dict.values())]
+        total_per_shift = sched.sum(axis=0, dtype=np.int64)
 
-        violations = 0
-        # iterate over all shifts and count violations:
-        for shift_index, num_of_teachers in enumerate(total_per_shift_list):
-            daily_shift_index = shift_index % self.shift_per_day  # -> 0, 1, or 2 for the 3 shifts per day
-            if (num_of_teachers > self.shift_max[daily_shift_index]):
-                violations += num_of_teachers - self.shift_max[daily_shift_index]
-            elif (num_of_teachers < self.shift_min[daily_shift_index]):
-                violations += self.shift_min[daily_shift_index] - num_of_teachers
+        # count the teachers above the max and below the min of each shift:
+        violations = int(np.maximum(total_per_shift - self.tiled_max, 0).sum() +
+                         np.maximum(self.tiled_min - total_per_shift, 0).sum())
 
-        return total_per_shift_list, violations
+        return total_per_shift.tolist(), violations
 
-    def count_shift_preference_violations(self, teacher_shifts_dict):
+    def count_shift_preference_violations(self, sched):
         """
         Counts the teacher-preferences violations in the schedule
-        :param teacher_shifts_dict: a dictionary with a separate schedule for each teacher
+        :param sched: a 2-D array with a separate row of shifts for each teacher
         :return: count of violations found
         """
-        violations = 0
-        for teacher_index, shift_preference in enumerate(self.shift_preference):
-            # duplicate the shift-preference over the days of the period
-            preference = shift_preference * (self.shifts_per_week // self.shift_per_day)
-            # iterate over the shifts and compare to preferences:
-            shifts = teacher_shifts_dict[self.teachers[teacher_index]]
-            for pref, shift in zip(preference, shifts):
-                if pref == 0 and shift == 1:
-                    violations += 1
-
-        return violations
+        # shifts taken where the preference is 0:
+        return int((self.pref_mask * sched).sum())
 
     def print_schedule_info(self, schedule):
         """
         Prints the schedule and violations details
         :param schedule: a list of binary values describing the given schedule
         """
-        teacher_shifts_dict = self.get_teacher_shifts(schedule)
+        sched = np.asarray(schedule, dtype=np.uint8).reshape(self.n_teachers, -1)
 
         print("Schedule for each teacher:")
-        for teacher in teacher_shifts_dict:  # all shifts of a single teacher
-            print(teacher, ":", teacher_shifts_dict[teacher])
+        for teacher, teacher_shifts in zip(self.teacher_labels, sched):  # all shifts of a single teacher
+            print(teacher, ":", teacher_shifts)
 
-        print("consecutive shift violations = ", self.count_consecutive_shift_violations(teacher_shifts_dict))
+        print("consecutive shift violations = ", self.count_consecutive_shift_violations(sched))
         print()
 
-        weekly_shifts_list, violations = self.count_shifts_per_week_violations(teacher_shifts_dict)
+        weekly_shifts_list, violations = self.count_shifts_per_week_violations_verbose(sched)
         print("Weekly Shifts = ", weekly_shifts_list)
         print("Shifts Per Week Violations = ", violations)
         print()
 
-        total_per_shift_list, violations = self.count_teachers_per_shift_violations(teacher_shifts_dict)
+        total_per_shift_list, violations = self.count_teachers_per_shift_violations(sched)
         print("Teachers Per Shift = ", total_per_shift_list)
         print("Teachers Per Shift Violations = ", violations)
         print()
 
-        shift_preference_violations = self.count_shift_preference_violations(teacher_shifts_dict)
+        shift_preference_violations = self.count_shift_preference_violations(sched)
         print("Shift Preference Violations = ", shift_preference_violations)
         print()
 